@@ -1,7 +1,7 @@
 import logging
 import os
 
-log_level = os.getenv("LOG_LEVEL", "info")
-level = logging.getLevelName(log_level.upper())
+# getLevelName returns a str like "Level FOO" for unknown names, the mapping also knows WARN and FATAL
+level = logging.getLevelNamesMapping().get(os.environ.get("LOG_LEVEL", "info").upper(), logging.INFO)
 log_format = "[L %(lineno)s - %(funcName)5s() ] %(message)s"
 logging.basicConfig(level=level, format=log_format)
@@ -3,26 +3,42 @@ All the enums for commands
 """
 
 from enum import Enum
+from typing import Final, NamedTuple
+
+# Plain module constants for the hot send/parse paths, avoids Enum member + .value resolution
+WELCOME: Final[bytes] = b"WELCOME"
+HEARTBEAT: Final[bytes] = b"Heartbeat\r\n"
+BYE: Final[bytes] = b"Bye\r\n"
+FOOTER: Final[bytes] = b"\x0D\x0A"
+ACK_OK: Final[bytes] = b"OK\r\n"
+ACK_ERROR: Final[bytes] = b"ERROR"
+
+# Notification titles shared by Headers, Notifications and Commands so each literal exists once
+_ACTIVATE_PROFILE: Final[bytes] = b"ActivateProfile"
+_INCOMING_SIGNAL_INFO: Final[bytes] = b"IncomingSignalInfo"
+_OUTGOING_SIGNAL_INFO: Final[bytes] = b"OngoingSignalInfo"
+_ASPECT_RATIO: Final[bytes] = b"AspectRatio"
+_MASKING_RATIO: Final[bytes] = b"MaskingRatio"
 
 
 # pylint: disable=missing-class-docstring invalid-name
 class Connections(Enum):
-    welcome = b"WELCOME"
-    heartbeat = b"Heartbeat\r\n"
-    bye = b"Bye\r\n"
+    welcome = WELCOME
+    heartbeat = HEARTBEAT
+    bye = BYE
 
 
 class Footer(Enum):
-    footer = b"\x0D\x0A"
+    footer = FOOTER
 
 
 class Headers(Enum):
     temperature = b"Temperatures"
-    activate_profile = b"ActivateProfile"
-    incoming_signal = b"IncomingSignalInfo"
-    outgoing_signal = b"OngoingSignalInfo"
-    aspect_ratio = b"AspectRatio"
-    masking_ratio = b"MaskingRatio"
+    activate_profile = _ACTIVATE_PROFILE
+    incoming_signal = _INCOMING_SIGNAL_INFO
+    outgoing_signal = _OUTGOING_SIGNAL_INFO
+    aspect_ratio = _ASPECT_RATIO
+    masking_ratio = _MASKING_RATIO
     mac = b"MacAddress"
     setting_page = b"SettingPage"
     config_page = b"ConfigPage"
@@ -30,8 +46,8 @@ class Headers(Enum):
 
 
 class ACKs(Enum):
-    reply = b"OK\r\n"
-    error = b"ERROR"
+    reply = ACK_OK
+    error = ACK_ERROR
 
 
 class Temperatures(Enum):
@@ -51,11 +67,11 @@ class AspectRatio(Enum):
 
 
 class Notifications(Enum):
-    ActivateProfile = b"ActivateProfile"
-    IncomingSignalInfo = b"IncomingSignalInfo"
-    OngoingSignalInfo = b"OngoingSignalInfo"
-    AspectRatio = b"AspectRatio"
-    MaskingRatio = b"MaskingRatio"
+    ActivateProfile = _ACTIVATE_PROFILE
+    IncomingSignalInfo = _INCOMING_SIGNAL_INFO
+    OngoingSignalInfo = _OUTGOING_SIGNAL_INFO
+    AspectRatio = _ASPECT_RATIO
+    MaskingRatio = _MASKING_RATIO
 
 
 class KeyPress(Enum):
@@ -101,11 +117,6 @@ class SingleCmd(Enum):
     """for things that are single words"""
 
 
-class IsInformational(Enum):
-    true = True
-    false = False
-
-
 class Menus(Enum):
     Info = b"Info"
     Settings = b"Settings"
@@ -122,37 +133,78 @@ class Profiles(Enum):
 
 
 class Commands(Enum):
+    # (payload, value enum, is informational)
     # Power stuff
-    PowerOff = b"PowerOff", SingleCmd, IsInformational.false
-    Standby = b"Standby", SingleCmd, IsInformational.false
-    Restart = b"Restart", SingleCmd, IsInformational.false
-    ReloadSoftware = b"ReloadSoftware", SingleCmd, IsInformational.false
-    Bye = b"Bye", SingleCmd, IsInformational.false
-    ResetTemporary = b"ResetTemporary", SingleCmd, IsInformational.false
+    PowerOff = b"PowerOff", SingleCmd, False
+    Standby = b"Standby", SingleCmd, False
+    Restart = b"Restart", SingleCmd, False
+    ReloadSoftware = b"ReloadSoftware", SingleCmd, False
+    Bye = b"Bye", SingleCmd, False
+    ResetTemporary = b"ResetTemporary", SingleCmd, False
 
-    ActivateProfile = b"ActivateProfile", Profiles, IsInformational.false
+    ActivateProfile = _ACTIVATE_PROFILE, Profiles, False
 
     # Menu
-    OpenMenu = b"OpenMenu", Menus, IsInformational.false
-    CloseMenu = b"CloseMenu", SingleCmd, IsInformational.false
-    KeyPress = b"KeyPress", KeyPress, IsInformational.false
-    KeyHold = b"KeyHold", KeyPress, IsInformational.false
-
-    GetIncomingSignalInfo = b"GetIncomingSignalInfo", SignalInfo, IsInformational.true
-    GetOutgoingSignalInfo = (
-        b"GetOutgoingSignalInfo",
-        OutgoingSignalInfo,
-        IsInformational.true,
-    )
-    GetAspectRatio = b"GetAspectRatio", AspectRatio, IsInformational.true
-    GetMaskingRatio = b"GetMaskingRatio", SingleCmd, IsInformational.true
-    GetTemperatures = b"GetTemperatures", Temperatures, IsInformational.true
-    GetMacAddress = b"GetMacAddress", SingleCmd, IsInformational.true
-
-    Toggle = b"Toggle", Toggle, IsInformational.false
-    ToneMapOn = b"ToneMapOn", SingleCmd, IsInformational.false
-    ToneMapOff = b"ToneMapOff", SingleCmd, IsInformational.false
-
-    Hotplug = b"Hotplug", SingleCmd, IsInformational.false
-    RefreshLicenseInfo = b"RefreshLicenseInfo", SingleCmd, IsInformational.false
-    Force1080p60Output = b"Force1080p60Output", SingleCmd, IsInformational.false
+    OpenMenu = b"OpenMenu", Menus, False
+    CloseMenu = b"CloseMenu", SingleCmd, False
+    # KeyHold must come first, once the KeyPress member exists it shadows the KeyPress enum in this class body
+    KeyHold = b"KeyHold", KeyPress, False
+    KeyPress = b"KeyPress", KeyPress, False
+
+    GetIncomingSignalInfo = b"GetIncomingSignalInfo", SignalInfo, True
+    GetOutgoingSignalInfo = b"GetOutgoingSignalInfo", OutgoingSignalInfo, True
+    GetAspectRatio = b"GetAspectRatio", AspectRatio, True
+    GetMaskingRatio = b"GetMaskingRatio", SingleCmd, True
+    GetTemperatures = b"GetTemperatures", Temperatures, True
+    GetMacAddress = b"GetMacAddress", SingleCmd, True
+
+    Toggle = b"Toggle", Toggle, False
+    ToneMapOn = b"ToneMapOn", SingleCmd, False
+    ToneMapOff = b"ToneMapOff", SingleCmd, False
+
+    Hotplug = b"Hotplug", SingleCmd, False
+    RefreshLicenseInfo = b"RefreshLicenseInfo", SingleCmd, False
+    Force1080p60Output = b"Force1080p60Output", SingleCmd, False
+
+
+class Command(NamedTuple):
+    """Flat record of a Commands member"""
+
+    payload: bytes
+    arg_type: type[Enum]
+    informational: bool
+    # arg_type flattened to value name -> wire bytes
+    args: dict[str, bytes]
+
+
+def _build_commands() -> dict[str, Command]:
+    """Flatten Commands and their value enums into plain dicts"""
+    commands: dict[str, Command] = {}
+    for command in Commands:
+        payload, arg_type, informational = command.value
+        args = {arg.name: arg.value for arg in arg_type if isinstance(arg.value, bytes)}
+        commands[command.name] = Command(payload, arg_type, informational, args)
+    return commands
+
+
+# name based dispatch without going through the Enum metaclass
+COMMANDS: Final[dict[str, Command]] = _build_commands()
+
+
+def _build_wire_frames() -> dict[str | tuple[str, ...], bytes]:
+    """Precompute the framed bytes for every bare command and every command + single enum value"""
+    frames: dict[str | tuple[str, ...], bytes] = {}
+    for name, command in COMMANDS.items():
+        frames[name] = command.payload + FOOTER
+        for arg_name, arg in command.args.items():
+            frames[(name, arg_name)] = command.payload + b" " + arg + FOOTER
+    return frames
+
+
+# e.g. WIRE_FRAMES["PowerOff"] == b"PowerOff\r\n", WIRE_FRAMES[("KeyPress", "MENU")] == b"KeyPress MENU\r\n"
+WIRE_FRAMES: Final[dict[str | tuple[str, ...], bytes]] = _build_wire_frames()
+
+
+def frame_command(payload: bytes, *args: bytes) -> bytes:
+    """Join a command with its values and the footer"""
+    return b" ".join((payload, *args)) + FOOTER
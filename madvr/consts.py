@@ -2,12 +2,29 @@
 
 REFRESH_TIME = 20
 PING_DELAY = 30
-COMMAND_TIMEOUT = 3
 PING_INTERVAL = 5
+# first retry delay after a failed probe, doubles up to PING_INTERVAL
+PING_BACKOFF_START = 1
+# max random seconds added to each retry delay
+PING_JITTER = 0.5
 HEARTBEAT_INTERVAL = 15
 CONNECT_TIMEOUT = 5
 DEFAULT_PORT = 44077
+# StreamReader buffer limit for notifications, 4x the asyncio default. A line longer than this is discarded
+STREAM_LIMIT = 2**18
+# deprecated, was the read() chunk size and is no longer used
 READ_LIMIT = 8000
+WRITE_QUEUE_SIZE = 64
+CMD_CACHE_SIZE = 256
 SMALL_DELAY = 2
+# kernel keepalive on the command socket, seconds idle before probing, between probes and probe count
+KEEPALIVE_IDLE = 30
+KEEPALIVE_INTERVAL = 5
+KEEPALIVE_COUNT = 3
+# seconds unacknowledged data may sit on the command socket before the kernel drops the connection (Linux)
+USER_TIMEOUT = 10
+CONNECT_PROBE_RETRIES = 3
+# coalesce bursts of notifications into one HA update
+STATE_UPDATE_DELAY = 0.05
 # save some cpu cycles
 TASK_CPU_DELAY = 0.1
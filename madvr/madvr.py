@@ -4,25 +4,68 @@ Implements the MadVR protocol
 
 import asyncio
 import logging
-from typing import Any, Final, Iterable
-
-from madvr.commands import Commands, Connections, Footer
+import random
+import socket
+import time
+import warnings
+from enum import Enum
+from typing import Any, Final, Iterable, Sequence
+
+from madvr.commands import COMMANDS, FOOTER, HEARTBEAT, WELCOME, WIRE_FRAMES, frame_command
 from madvr.consts import (
-    COMMAND_TIMEOUT,
+    CMD_CACHE_SIZE,
+    CONNECT_PROBE_RETRIES,
     CONNECT_TIMEOUT,
     DEFAULT_PORT,
     HEARTBEAT_INTERVAL,
+    KEEPALIVE_COUNT,
+    KEEPALIVE_IDLE,
+    KEEPALIVE_INTERVAL,
+    PING_BACKOFF_START,
     PING_DELAY,
     PING_INTERVAL,
-    READ_LIMIT,
+    PING_JITTER,
     REFRESH_TIME,
     SMALL_DELAY,
+    STATE_UPDATE_DELAY,
+    STREAM_LIMIT,
     TASK_CPU_DELAY,
+    USER_TIMEOUT,
+    WRITE_QUEUE_SIZE,
 )
-from madvr.errors import AckError, HeartBeatError, RetryExceededError
+from madvr.errors import AckError, HeartBeatError
 from madvr.notifications import NotificationProcessor
 from madvr.wol import send_magic_packet
 
+# sent every REFRESH_TIME
+_REFRESH_COMMANDS: Final = (
+    ("GetMacAddress",),
+    ("GetTemperatures",),
+    # get signal info in case a change was missed and its sitting in limbo
+    ("GetIncomingSignalInfo",),
+    ("GetOutgoingSignalInfo",),
+    ("GetAspectRatio",),
+    ("GetMaskingRatio",),
+)
+# sent once connected
+_CONNECT_COMMANDS: Final = (
+    ("GetIncomingSignalInfo",),
+    ("GetOutgoingSignalInfo",),
+    ("GetAspectRatio",),
+    ("GetMaskingRatio",),
+    ("GetMacAddress",),
+)
+
+
+def _resolve_frame(done: asyncio.Future[None], err: BaseException | None = None) -> None:
+    """Report the outcome of a queued frame unless the sender already gave up waiting"""
+    if done.done():
+        return
+    if err is None:
+        done.set_result(None)
+    else:
+        done.set_exception(err)
+
 
 class Madvr:
     """MadVR Control"""
@@ -54,32 +97,47 @@ class Madvr:
         self.connection_event = asyncio.Event()
         self.stop_heartbeat = asyncio.Event()
 
-        # command queue to store commands as they come in
-        self.command_queue: asyncio.Queue = asyncio.Queue()
+        # command queue to store commands as they come in, already framed. None wakes the queue task on stop
+        self.command_queue: asyncio.Queue[bytes | None] = asyncio.Queue()
         self.stop_commands_flag = asyncio.Event()
 
         # background tasks
         self.tasks: list[asyncio.Task] = []
+        # every write goes through this task, without it writes fail fast instead of waiting out the timeout
+        self._write_task: asyncio.Task | None = None
         self.loop = loop
 
-        self.lock = asyncio.Lock()
+        # frames waiting for task_write_frames with the connection they belong to and a future the sender
+        # awaits, bounded so a stalled socket pushes back on senders
+        self.write_queue: asyncio.Queue[tuple[asyncio.StreamWriter, bytes, asyncio.Future[None]]] = asyncio.Queue(
+            maxsize=WRITE_QUEUE_SIZE
+        )
 
         # Const values
-        self.MADVR_OK: Final = Connections.welcome.value
-        self.HEARTBEAT: Final = Connections.heartbeat.value
+        self.MADVR_OK: Final = WELCOME
+        self.HEARTBEAT: Final = HEARTBEAT
+        # built frames keyed by the raw command, HA sends the same handful of commands over and over
+        self._cmd_cache: dict[tuple[str, ...], tuple[bytes, type[Enum]]] = {}
 
         # stores all attributes
         self.msg_dict: dict = {}
+        # mirrors msg_dict["is_on"] so the frequently polled is_on is a plain attribute read
+        self._is_on: bool = False
+        # last reported mac, kept when msg_dict is cleared on power off so power_on can still wake the device
+        self._mac_address: str = ""
 
         # Sockets
-        self.reader = None
-        self.writer = None
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
 
-        self.read_limit: int = READ_LIMIT
-        self.command_read_timeout: int = COMMAND_TIMEOUT
+        self.stream_limit: int = STREAM_LIMIT
+        # monotonic time of the last frame from the device, proof the link is alive without probing it
+        self._last_read: float = 0.0
 
         # self.async_write_ha_state from HA
         self.update_callback: Any = None
+        # pending coalesced state update
+        self._update_handle: asyncio.TimerHandle | None = None
 
         self.notification_processor = NotificationProcessor(self.logger)
         self.powered_off_recently: bool = False
@@ -92,12 +150,23 @@ class Madvr:
     @property
     def is_on(self) -> bool:
         """Return true if the device is on."""
-        return self.msg_dict.get("is_on", False)
+        return self._is_on
 
     @property
     def mac_address(self) -> str:
         """Return the mac address of the device."""
-        return self.msg_dict.get("mac_address", "")
+        return self._mac_address
+
+    @property
+    def read_limit(self) -> int:
+        """Deprecated alias of stream_limit."""
+        warnings.warn("read_limit is deprecated, use stream_limit", DeprecationWarning, stacklevel=2)
+        return self.stream_limit
+
+    @read_limit.setter
+    def read_limit(self, value: int) -> None:
+        warnings.warn("read_limit is deprecated, use stream_limit", DeprecationWarning, stacklevel=2)
+        self.stream_limit = value
 
     def set_update_callback(self, callback: Any) -> None:
         """Function to set the callback for updating HA state"""
@@ -107,23 +176,33 @@ class Madvr:
         """Add background tasks."""
         # loop can be passed from HA
         if not self.loop:
-            self.loop = asyncio.get_event_loop()
-
-        task_queue = self.loop.create_task(self.task_handle_queue())
-        self.tasks.append(task_queue)
-
-        task_notif = self.loop.create_task(self.task_read_notifications())
-        self.tasks.append(task_notif)
-
-        task_hb = self.loop.create_task(self.send_heartbeat())
-        self.tasks.append(task_hb)
-
-        # this will only be cancelled on unload so thats fine
-        task_ping = self.loop.create_task(self.task_ping_until_alive())
-        self.tasks.append(task_ping)
-
-        task_refresh = self.loop.create_task(self.task_refresh_info())
-        self.tasks.append(task_refresh)
+            # called from a coroutine so there is always a running loop, get_event_loop is deprecated here
+            self.loop = asyncio.get_running_loop()
+
+        background_tasks = (
+            ("madvr_queue", self.task_handle_queue()),
+            ("madvr_write", self.task_write_frames()),
+            ("madvr_notifications", self.task_read_notifications()),
+            ("madvr_heartbeat", self.send_heartbeat()),
+            # this will only be cancelled on unload so thats fine
+            ("madvr_ping", self.task_ping_until_alive()),
+            ("madvr_refresh", self.task_refresh_info()),
+        )
+        for name, coro in background_tasks:
+            task = self.loop.create_task(coro, name=name)
+            task.add_done_callback(self._on_task_done)
+            self.tasks.append(task)
+            if name == "madvr_write":
+                self._write_task = task
+
+    def _writer_running(self) -> bool:
+        """Check the writer task is there to pick up queued frames"""
+        return self._write_task is not None and not self._write_task.done()
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        """Log background tasks that stopped on an error instead of losing it with the task"""
+        if not task.cancelled() and (err := task.exception()) is not None:
+            self.logger.error("Background task %s stopped: %s", task.get_name(), err)
 
     async def async_cancel_tasks(self) -> None:
         """Cancel all tasks."""
@@ -133,69 +212,124 @@ class Madvr:
         # Wait for all tasks to be cancelled
         await asyncio.gather(*self.tasks, return_exceptions=True)
         self.tasks.clear()
+        # a pending state flush would otherwise fire into HA after unload
+        self._cancel_ha_state_update()
 
     ##########################
     # Background tasks
     ##########################
     async def task_handle_queue(self) -> None:
         """Handle command queue."""
+        queue = self.command_queue
         while True:
             await self.connection_event.wait()
-            while not self.command_queue.empty() and not self.stop_commands_flag.is_set():
-                command = await self.command_queue.get()
-                self.logger.debug("sending queue command %s", command)
-                try:
-                    await self.send_command(command)
-                except NotImplementedError as err:
-                    self.logger.warning("Command not implemented: %s", err)
-                except (ConnectionError, ConnectionResetError, BrokenPipeError):
-                    self.logger.warning("Task Queue: Envy seems to be disconnected")
-                except AttributeError:
-                    self.logger.warning("Issue sending command from queue")
-                except RetryExceededError:
-                    self.logger.warning("Retry exceeded for command %s", command)
-                except OSError as err:
-                    self.logger.error("Unexpected error when sending command: %s", err)
-
-            if self.stop_commands_flag.is_set():
-                self.clear_queue()
-                self.logger.debug("Stopped processing commands")
-                break
+            # suspends until a command is queued instead of polling the queue
+            command = await queue.get()
+            try:
+                # None is the wakeup sentinel from stop(), anything queued while stopped is dropped
+                if command is None or self.stop_commands_flag.is_set():
+                    self.clear_queue()
+                    self.logger.debug("Stopped processing commands")
+                    continue
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("sending queue command %s", command)
+                # commands were validated and framed when they were queued
+                await self._write_with_timeout(command)
+            except (ConnectionError, ConnectionResetError, BrokenPipeError):
+                self.logger.warning("Task Queue: Envy seems to be disconnected")
+            except OSError as err:
+                self.logger.error("Unexpected error when sending command: %s", err)
+            finally:
+                queue.task_done()
 
-            await asyncio.sleep(TASK_CPU_DELAY)
+    async def task_write_frames(self) -> None:
+        """
+        Write queued frames to the socket. This is the only writer so writes and drains never interleave
+        """
+        queue = self.write_queue
+        while True:
+            items = [await queue.get()]
+            # coalesce whatever else is already queued into the same write and drain
+            while not queue.empty():
+                items.append(queue.get_nowait())
+            writer = self.writer
+            try:
+                # frames queued for a connection that has since been closed or replaced are never replayed
+                stale = [done for frame_writer, _, done in items if frame_writer is not writer]
+                if stale:
+                    self.logger.debug("Connection changed, dropping %s queued frames", len(stale))
+                    for done in stale:
+                        _resolve_frame(done, ConnectionError("Connection closed before the frame was sent"))
+                pending = [(frame, done) for frame_writer, frame, done in items if frame_writer is writer]
+                if writer and pending:
+                    try:
+                        writer.writelines([frame for frame, _ in pending])
+                        await asyncio.wait_for(writer.drain(), timeout=self.connect_timeout)
+                    except (TimeoutError, OSError) as err:
+                        self.logger.error("Error writing to socket: %s", err)
+                        # the reader then fails on the closed transport and runs the usual reconnect
+                        writer.close()
+                        for _, done in pending:
+                            _resolve_frame(done, err)
+                    else:
+                        for _, done in pending:
+                            _resolve_frame(done)
+            finally:
+                for _ in items:
+                    queue.task_done()
 
     async def task_read_notifications(self) -> None:
         """
         Read notifications from the server and update attributes
         """
+        # stream whose oversized line is being dropped, its remainder up to the next footer is not a notification
+        discarding: asyncio.StreamReader | None = None
         while True:
             # wait until the connection is established
             await self.connection_event.wait()
+            # bind once, close_connection can reset self.reader while we are suspended
+            reader = self.reader
+            if not reader:
+                # connected without a reader only happens mid reconnect, back off instead of spinning
+                await asyncio.sleep(TASK_CPU_DELAY)
+                continue
+            # readuntil is the yield point, no extra sleep needed between notifications
             try:
-                if self.reader:
-                    msg = await asyncio.wait_for(
-                        self.reader.read(self.read_limit),
-                        timeout=self.command_read_timeout,
-                    )
-                    await self._process_notifications(msg.decode("utf-8"))
-            except TimeoutError:
-                self.logger.info("No notifications to read")
+                # one framed notification per read, never a partial line. No timeout, a quiet device is not
+                # an error and closing the connection ends the read with IncompleteReadError
+                try:
+                    msg = await reader.readuntil(FOOTER)
+                except asyncio.LimitOverrunError as err:
+                    # drop what is buffered of the oversized line and skip the rest of it up to the next footer
+                    if discarding is not reader:
+                        self.logger.warning("Notification exceeded the read limit, discarding it: %s", err)
+                    discarding = reader
+                    await reader.read(err.consumed)
+                    continue
+                self._last_read = time.monotonic()
+                if discarding is reader:
+                    # tail of the dropped line
+                    discarding = None
+                    continue
+                await self._process_notifications(msg.decode("utf-8", errors="replace"))
             except (
+                asyncio.IncompleteReadError,
                 ConnectionResetError,
                 AttributeError,
                 BrokenPipeError,
                 OSError,
             ) as err:
-                self.logger.error("Reading notifications failed or timed out: %s", err)
+                # close_connection (power off, socket errors) ends the pending read too, only a connection
+                # that is still current and meant to be up is reconnected
+                if reader is not self.reader or not self.connected:
+                    self.logger.debug("Connection was closed, waiting for the next one")
+                    continue
+                self.logger.error("Reading notifications failed: %s", err)
                 try:
                     # try to connect otherwise it will mark the device as offline
                     await self._reconnect()
                 except ConnectionError as e:
                     self.logger.error("Connection error when reading notifications: %s", e)
-                continue
-
-            await asyncio.sleep(TASK_CPU_DELAY)
-            continue
 
     async def send_heartbeat(self, once: bool = False) -> None:
         """
@@ -220,17 +354,27 @@ class Madvr:
                 await handle_heartbeat_error(err)
             return
 
-        while not self.stop_heartbeat.is_set():
+        while True:
             await self.connection_event.wait()
+            if self.stop_heartbeat.is_set():
+                # paused by stop(), _reconnect clears the flag once the next connection is up
+                await asyncio.sleep(self.heartbeat_interval)
+                continue
             try:
                 await perform_heartbeat()
             except (TimeoutError, OSError) as err:
-                await handle_heartbeat_error(err)
-            finally:
-                await asyncio.sleep(self.heartbeat_interval)
+                # failed writes close the connection and the reader reconnects, keep the loop alive for that
+                self.logger.error("Error when sending heartbeat: %s", err)
+            # wait out the interval on the stop event so stop() pauses the loop right away
+            try:
+                await asyncio.wait_for(self.stop_heartbeat.wait(), timeout=self.heartbeat_interval)
+            except TimeoutError:
+                pass
 
     async def task_ping_until_alive(self) -> None:
         """Check if the device is connectable and connect to it on success."""
+        # failed probes start retrying quickly and back off up to ping_interval
+        backoff = PING_BACKOFF_START
         while True:
             # this will induce flapping otherwise
             if self.powered_off_recently:
@@ -242,46 +386,51 @@ class Madvr:
                 # reset the flag
                 self.powered_off_recently = False
 
-            is_connectable = await self.is_device_connectable()
+            # the device answers every heartbeat, if it spoke recently the link is fine and a probe is wasted
+            if self.connected and time.monotonic() - self._last_read < self.heartbeat_interval * 2:
+                await asyncio.sleep(self.ping_interval)
+                continue
 
-            if is_connectable:
-                # Double-check connectivity after a short delay
-                await asyncio.sleep(SMALL_DELAY)
-                is_connectable = await self.is_device_connectable()
+            if self.connected and not self._socket_alive():
+                # a pending socket error means this connection is broken, not that the device is off,
+                # so drop it and let the probe below decide whether to reconnect
+                self.logger.debug("Socket reported an error, closing the connection")
+                await self.close_connection()
 
-                if is_connectable and not self.connected:
+            # while connected a failed probe means power off, so retry before deciding. Otherwise single shot,
+            # the task's own backoff does the retrying
+            is_connectable = await self.is_device_connectable(retries=CONNECT_PROBE_RETRIES if self.connected else 1)
+
+            if is_connectable:
+                # a single probe is enough, open_connection fails cleanly if the device went away since
+                if not self.connected:
                     self.logger.debug("Device is connectable, attempting to connect")
                     try:
                         await self.open_connection()
                     except ConnectionError as err:
                         self.logger.error("Error opening connection after connectivity check: %s", err)
+                backoff = PING_BACKOFF_START
+                delay: float = self.ping_interval
             else:
-                self.logger.debug(
-                    "Device is not connectable, retrying in %s seconds",
-                    self.ping_interval,
-                )
+                # jitter keeps several clients of the same device from probing in lockstep
+                delay = backoff + random.uniform(0, PING_JITTER)
+                backoff = min(backoff * 2, self.ping_interval)
+                self.logger.debug("Device is not connectable, retrying in %.1f seconds", delay)
                 # if its not connectable but we are "connected", then the device was turned off
                 if self.connected:
                     await self._handle_power_off()
 
-            await asyncio.sleep(self.ping_interval)
+            await asyncio.sleep(delay)
 
     async def task_refresh_info(self) -> None:
         """Task to refresh some device info every 20s"""
         while True:
             # wait until the connection is established
             await self.connection_event.wait()
-            cmds = [
-                ["GetMacAddress"],
-                ["GetTemperatures"],
-                # get signal info in case a change was missed and its sitting in limbo
-                ["GetIncomingSignalInfo"],
-                ["GetOutgoingSignalInfo"],
-                ["GetAspectRatio"],
-                ["GetMaskingRatio"],
-            ]
-            for cmd in cmds:
-                await self.add_command_to_queue(cmd)
+            try:
+                await self._send_command_batch(_REFRESH_COMMANDS)
+            except ConnectionError as err:
+                self.logger.warning("Error refreshing device info: %s", err)
             await asyncio.sleep(REFRESH_TIME)
 
     ##########################
@@ -292,10 +441,10 @@ class Madvr:
         """Set the connection state."""
         if is_connected:
             self.connection_event.set()
-            self.msg_dict["is_on"] = True
         else:
             self.connection_event.clear()
-            self.msg_dict["is_on"] = False
+        self._is_on = is_connected
+        self.msg_dict["is_on"] = is_connected
         await self._update_ha_state()
 
     def stop(self) -> None:
@@ -303,9 +452,21 @@ class Madvr:
         self.logger.info("Setting stop flags for tasks")
         self.stop_heartbeat.set()
         self.stop_commands_flag.set()
+        # drop pending commands and wake the queue task if it is waiting on an empty queue
+        self.clear_queue()
+        self.command_queue.put_nowait(None)
 
     async def _write_with_timeout(self, data: bytes) -> None:
-        """Write data to the socket with a timeout."""
+        """
+        Hand data to the writer task and wait until it has been written to the current connection.
+
+        Raises ConnectionError if there is no connection or it went away before the data was written,
+        TimeoutError or OSError if the write did not complete
+        """
+        # nothing would ever take the frame off the queue, e.g. tasks not started yet or cancelled on unload
+        if not self._writer_running():
+            raise ConnectionError("Writer task is not running")
+
         if not self.connected:
             self.logger.error("Connection not established. Reconnecting")
             await self._reconnect()
@@ -314,21 +475,16 @@ class Madvr:
             self.logger.error("Writer is not initialized. Reconnecting")
             await self._reconnect()
 
-        async def write_and_drain() -> None:
-            if not self.writer:
-                raise ConnectionError("Writer is not initialized")
-            self.writer.write(data)
-            await self.writer.drain()
-
+        writer = self.writer
+        if writer is None:
+            raise ConnectionError("Writer is not initialized")
+        done: asyncio.Future[None] = asyncio.get_running_loop().create_future()
         try:
-            async with self.lock:
-                await asyncio.wait_for(write_and_drain(), timeout=self.connect_timeout)
+            await asyncio.wait_for(self.write_queue.put((writer, data, done)), timeout=self.connect_timeout)
         except TimeoutError:
-            self.logger.error("Write operation timed out after %s seconds", self.connect_timeout)
-            await self._reconnect()
-        except (ConnectionResetError, OSError) as err:
-            self.logger.error("Error writing to socket: %s", err)
-            await self._reconnect()
+            self.logger.error("Write queue still full after %s seconds", self.connect_timeout)
+            raise
+        await asyncio.wait_for(done, timeout=self.connect_timeout)
 
     async def _reconnect(self) -> None:
         """
@@ -345,13 +501,14 @@ class Madvr:
 
                 # Command client
                 self.reader, self.writer = await asyncio.wait_for(
-                    asyncio.open_connection(self.host, self.port),  # type: ignore[arg-type]
+                    # room for a burst of notifications, the limit caps one line and the buffered backlog
+                    asyncio.open_connection(self.host, self.port, limit=self.stream_limit),  # type: ignore[arg-type]
                     timeout=5,
                 )
+                self._configure_socket()
                 self.logger.debug("Handshaking")
                 self.logger.info("Waiting for envy to be available")
-
-                await asyncio.sleep(SMALL_DELAY)
+                await self._wait_for_welcome()
                 # unblock heartbeat task
                 await self._set_connected(True)
                 self.stop_heartbeat.clear()
@@ -362,7 +519,7 @@ class Madvr:
                 self.logger.info("Connection established")
                 self.stop_commands_flag.clear()
 
-            except (TimeoutError, HeartBeatError, OSError) as err:
+            except (TimeoutError, HeartBeatError, OSError, asyncio.IncompleteReadError) as err:
                 self.logger.error("Heartbeat failed. Connection not established %s", err)
                 await self._set_connected(False)
                 raise ConnectionError("Heartbeat failed") from err
@@ -371,46 +528,118 @@ class Madvr:
             self.logger.debug("Device is offline")
             await self._handle_power_off()
 
-    async def is_device_connectable(self) -> bool:
+    async def _wait_for_welcome(self) -> None:
+        """
+        Wait up to SMALL_DELAY for the banner the Envy sends once it accepts commands.
+
+        Raises IncompleteReadError if the device closes the connection first
+        """
+        if self.reader is None:
+            return
+        try:
+            banner = await asyncio.wait_for(self.reader.readuntil(FOOTER), timeout=SMALL_DELAY)
+        except TimeoutError:
+            # same as the old fixed wait, carry on and let the heartbeat decide
+            self.logger.debug("No welcome banner received, continuing")
+            return
+        if not banner.startswith(self.MADVR_OK):
+            self.logger.debug("Unexpected banner: %s", banner)
+
+    def _configure_socket(self) -> None:
+        """Turn on kernel keepalive, disable Nagle and drop write buffering on the command socket."""
+        if self.writer is None:
+            return
+        # drain() only returns once the kernel took the bytes, write_queue is the only backlog
+        self.writer.transport.set_write_buffer_limits(high=0)
+        sock = self.writer.get_extra_info("socket")
+        if sock is None:
+            return
+        options = [
+            (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        # the tuning knobs are not available on every platform
+        for name, value in (
+            ("TCP_KEEPIDLE", KEEPALIVE_IDLE),
+            ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+            ("TCP_KEEPCNT", KEEPALIVE_COUNT),
+            # keepalive only probes an idle socket, this catches unacknowledged writes to a dead peer
+            ("TCP_USER_TIMEOUT", USER_TIMEOUT * 1000),
+        ):
+            if hasattr(socket, name):
+                options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+        for level, option, value in options:
+            try:
+                sock.setsockopt(level, option, value)
+            except OSError as err:
+                self.logger.debug("Could not set socket option %s: %s", option, err)
+
+    def _socket_alive(self) -> bool:
+        """Check the open socket for a pending error. Only a cheap negative check, a clean socket can still be dead."""
+        if self.writer is None:
+            return False
+        sock = self.writer.get_extra_info("socket")
+        if sock is None:
+            return False
+        try:
+            return sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+        except OSError:
+            return False
+
+    async def is_device_connectable(self, retries: int = CONNECT_PROBE_RETRIES) -> bool:
         """Check if the device is connectable without ping. The device is only connectable when on."""
-        retry_count = 0
-        # loop because upgrading firmware can take a few seconds and will kill the connection
-        while retry_count < 10:
+        loop = self.loop or asyncio.get_running_loop()
+        # retry because upgrading firmware can take a few seconds and will kill the connection
+        for attempt in range(retries):
             try:
+                # bare transport, no stream reader/writer needed for a liveness probe
                 async with asyncio.timeout(SMALL_DELAY):
-                    _, writer = await asyncio.open_connection(self.host, self.port)
-                    writer.close()
-                    await writer.wait_closed()
-                    return True
-            except (TimeoutError, ConnectionRefusedError, OSError):
-                await asyncio.sleep(SMALL_DELAY)
-                retry_count += 1
-                continue
+                    transport, _ = await loop.create_connection(asyncio.Protocol, self.host, self.port)
+                # no need to wait for a graceful close
+                transport.close()
+                return True
+            except (TimeoutError, OSError):
+                if attempt < retries - 1:
+                    await asyncio.sleep(SMALL_DELAY * 2**attempt)
         self.logger.debug("Device is not connectable")
         return False
 
-    async def _clear_attr(self) -> None:
+    def _clear_attr(self) -> None:
         """
         Clear instance attr so HA doesn't report stale values and tells HA to write values to state
         """
         # Incoming attrs
         self.msg_dict = {"is_on": False}  # Clear attributes and set 'is_on' to False
+        self._is_on = False
+        # otherwise a stale is_on=False from a PowerOff notification resurfaces after the next connect
+        self.notification_processor.msg_dict.clear()
         if self.update_callback:
             self.update_callback(self.msg_dict)
 
     async def close_connection(self) -> None:
         """close the connection"""
         self.logger.debug("closing connection")
-        try:
-            if self.writer:
-                self.writer.close()
-                await self.writer.wait_closed()
-        except (ConnectionResetError, AttributeError):
-            pass
+        if self.writer and self._writer_running():
+            # let the writer task send what is already queued, e.g. PowerOff, before the socket goes away
+            try:
+                await asyncio.wait_for(self.write_queue.join(), timeout=SMALL_DELAY)
+            except TimeoutError:
+                self.logger.warning("Pending writes not flushed before closing the connection")
+        writer = self.writer
         self.writer = None
         self.reader = None
+        if writer:
+            writer.close()
+        # mark the device off before the teardown, wait_closed can stall for seconds on a dead peer
         await self._set_connected(False)
-        await self._clear_attr()
+        self._clear_attr()
+        # _clear_attr already pushed the final state
+        self._cancel_ha_state_update()
+        if writer:
+            try:
+                await asyncio.wait_for(writer.wait_closed(), timeout=SMALL_DELAY)
+            except (TimeoutError, ConnectionResetError, BrokenPipeError):
+                pass
 
     async def open_connection(self) -> None:
         """Open a connection"""
@@ -422,16 +651,15 @@ class Madvr:
             self.logger.error("Error opening connection: %s", err)
             raise
 
+        # _reconnect returns without raising when the device is offline, nothing to refresh then
+        if not self.connected:
+            return
+
         # once connected, try to refresh data once in the case the device was turned connected to while on already
-        cmds = [
-            ["GetIncomingSignalInfo"],
-            ["GetOutgoingSignalInfo"],
-            ["GetAspectRatio"],
-            ["GetMaskingRatio"],
-            ["GetMacAddress"],
-        ]
-        for cmd in cmds:
-            await self.add_command_to_queue(cmd)
+        try:
+            await self._send_command_batch(_CONNECT_COMMANDS)
+        except ConnectionError as err:
+            self.logger.warning("Error refreshing device info after connecting: %s", err)
 
     @property
     def connected(self) -> bool:
@@ -442,16 +670,35 @@ class Madvr:
     # Commands
     ##########################
     async def add_command_to_queue(self, command: Iterable[str]) -> None:
-        """Add a command to the queue"""
+        """
+        Add a command to the queue
+
+        Raises NotImplementedError if the command or its values are not supported
+        """
+        # callers may pass any iterable, _construct_command needs to index and hash it
+        command = tuple(command)
         self.logger.info("Adding command to queue: %s", command)
-        await self.command_queue.put(command)
+        # validate and frame up front so a bad command fails here and never reaches the queue
+        try:
+            cmd, _ = self._construct_command(command)
+        except NotImplementedError as err:
+            self.logger.warning("Command not implemented: %s -- %s", command, err)
+            raise
+        # unbounded queue, put never has to wait
+        self.command_queue.put_nowait(cmd)
 
     def clear_queue(self) -> None:
         """Clear queue."""
         self.logger.info("Clearing command queue")
-        self.command_queue = asyncio.Queue()
+        # drain in place so anything awaiting this queue keeps a valid reference
+        while True:
+            try:
+                self.command_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            self.command_queue.task_done()
 
-    async def _construct_command(self, raw_command: list[str]) -> tuple[bytes, str]:
+    def _construct_command(self, raw_command: Sequence[str]) -> tuple[bytes, type[Enum]]:
         """
         Transform commands into their byte values from the string value
 
@@ -459,10 +706,17 @@ class Madvr:
 
         Return:
             bytes: the value to send in bytes
-            str: the 'msg' field in the Enum used to filter notifications
+            type[Enum]: the value Enum of the command
         """
-        self.logger.debug("raw_command: %s -- raw_command length: %s", raw_command, len(raw_command))
-        skip_val = False
+        key = tuple(raw_command)
+        cached = self._cmd_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # checked once, the debug lines below format lists on every new command
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self.logger.debug("raw_command: %s -- raw_command length: %s", raw_command, len(raw_command))
         # HA seems to always send commands as a list even if you set them as a str
 
         # This lets you use single cmds or something with val like KEYPRESS
@@ -470,62 +724,66 @@ class Madvr:
         # If len is 1 like ["keypress,val"], then try to split, otherwise its just one word
         # sent directly from HA send_command
         if len(raw_command) == 1:
-            try:
-                # ['key_press, menu'] -> 'key_press', ['menu']
-                # ['activate_profile, SOURCE, 1'] -> 'activate_profile', ['SOURCE', '1']
-                command, *raw_value = raw_command[0].split(",")
-                # remove space
-                values = [val.strip() for val in raw_value]
+            # ['key_press, menu'] -> 'key_press', ['menu']
+            # ['activate_profile, SOURCE, 1'] -> 'activate_profile', ['SOURCE', '1']
+            # ['PowerOff'] -> 'PowerOff', []
+            command, *raw_value = raw_command[0].split(",")
+            # remove space
+            values = [val.strip() for val in raw_value]
+            if debug:
                 self.logger.debug("using command %s and values %s", command, values)
-            # if valuerror it means theres just one command like PowerOff, so use that directly
-            except ValueError as err:
-                self.logger.debug(err)
-                command = raw_command[0]
-                skip_val = True
         elif len(raw_command) > 3:
             raise NotImplementedError(f"Too many values provided {raw_command}")
         else:
             # else a command was provided as a proper list ['keypress', 'menu']
             # raw command will be a list of 2+
-            command, *values = raw_command
-
-        self.logger.debug("checking command %s", command)
+            command, *raw_value = raw_command
+            values = [val.strip() for val in raw_value]
 
         # Check if command is implemented
-        if not hasattr(Commands, command):
+        entry = COMMANDS.get(command)
+        if entry is None:
             raise NotImplementedError(f"Command not implemented: {command}")
-        self.logger.debug("Found command")
-        # construct the command with nested Enums
-        command_name, val, _ = Commands[command].value
+        command_name, val, _, arg_map = entry
 
-        # if there is a value to process
-        cmd: bytes = b""
-        if not skip_val:
+        # bare commands and single enum values are precomputed, skip building them
+        cmd = WIRE_FRAMES.get((command, *values) if values else command)
+        if cmd is None:
             try:
-                # add the base command
-                command_base: bytes = command_name
-
-                # append each value with a space
-                for value in values:
-                    # if value is a number, use it directly
-                    if value.isnumeric():  # encode 1 for ActivateProfile
-                        command_base += b" " + value.encode("utf-8")
-                    else:
-                        # else use the enum
-                        command_base += b" " + val[value.lstrip(" ")].value
-
-                # Construct command based on required values
-                cmd = command_base + Footer.footer.value
-
+                # if value is a number, use it directly (ActivateProfile SOURCE 1), else use the enum
+                args = [value.encode("utf-8") if value.isnumeric() else arg_map[value] for value in values]
             except KeyError as exc:
                 raise NotImplementedError("Incorrect parameter given for command") from exc
-        else:
-            cmd = command_name + Footer.footer.value
 
-        self.logger.debug("constructed command: %s", cmd)
+            cmd = frame_command(command_name, *args)
+
+        # only valid commands get here, numeric args are the only open-ended part so cap the size
+        if len(self._cmd_cache) < CMD_CACHE_SIZE:
+            self._cmd_cache[key] = (cmd, val)
 
         return cmd, val
 
+    async def _send_command_batch(self, commands: Iterable[Sequence[str]]) -> None:
+        """
+        Send several commands with a single write instead of one write and drain per command
+
+        Raises:
+            NotImplementedError: If a command is not supported.
+            ConnectionError: If there's any connection-related issue.
+        """
+        # same as the queue path, nothing goes out once power_off or stop() set the flag
+        if self.stop_commands_flag.is_set():
+            self.logger.debug("Commands are stopped, not sending batch")
+            return
+        frames = [self._construct_command(command)[0] for command in commands]
+        self.logger.debug("Sending command batch: %s", frames)
+
+        try:
+            await self._write_with_timeout(b"".join(frames))
+        except (ConnectionResetError, TimeoutError, OSError) as err:
+            self.logger.error("Error writing command batch to socket: %s", err)
+            raise ConnectionError("Failed to send command batch") from err
+
     async def send_command(self, command: list) -> None:
         """
         Send a given command to the MadVR device.
@@ -538,12 +796,13 @@ class Madvr:
             ConnectionError: If there's any connection-related issue.
         """
         try:
-            cmd, enum_type = await self._construct_command(command)
+            cmd, enum_type = self._construct_command(command)
         except NotImplementedError as err:
             self.logger.warning("Command not implemented: %s -- %s", command, err)
             raise
 
-        self.logger.debug("Using values: %s %s", cmd, enum_type)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Using values: %s %s", cmd, enum_type)
 
         try:
             await self._write_with_timeout(cmd)
@@ -558,20 +817,37 @@ class Madvr:
         if processed_data.get("power_off"):
             await self._handle_power_off()
 
-        # only update HA if the data has changed
-        if processed_data != self.msg_dict:
-            self.msg_dict.update(processed_data)
+        # only write keys whose value changed and only update HA if something did
+        changed = False
+        msg_dict = self.msg_dict
+        for key, value in processed_data.items():
+            if msg_dict.get(key) != value:
+                msg_dict[key] = value
+                changed = True
+        if changed:
+            # a PowerOff/Standby notification turns the device off
+            self._is_on = msg_dict.get("is_on", False)
+            self._mac_address = msg_dict.get("mac_address", self._mac_address)
             await self._update_ha_state()
 
     async def _handle_power_off(self) -> None:
         """Process out of band power off notifications"""
         self.powered_off_recently = True
         # this will mark the device as off
-        await self._clear_attr()
+        self._clear_attr()
         self.stop()
         await self.close_connection()
 
     async def _update_ha_state(self) -> None:
+        """Schedule a state update, a burst of changes is coalesced into one callback"""
+        if self.update_callback is None or self._update_handle is not None:
+            return
+        loop = self.loop or asyncio.get_running_loop()
+        self._update_handle = loop.call_later(STATE_UPDATE_DELAY, self._flush_ha_state)
+
+    def _flush_ha_state(self) -> None:
+        """Send the current state to HA"""
+        self._update_handle = None
         if self.update_callback is not None:
             try:
                 self.logger.info("Updating HA with %s", self.msg_dict)
@@ -579,6 +855,12 @@ class Madvr:
             except Exception as err:  # pylint: disable=broad-except
                 self.logger.error("Error updating HA: %s", err)
 
+    def _cancel_ha_state_update(self) -> None:
+        """Drop a pending state update"""
+        if self._update_handle is not None:
+            self._update_handle.cancel()
+            self._update_handle = None
+
     async def power_on(self, mac: str = "") -> None:
         """
         Power on the device
@@ -1,6 +1,11 @@
 """Implement notification processing for MadVR."""
 
 import logging
+import re
+from typing import Callable
+
+# a notification is "<Title> <fields>" per line, lines without fields (OK, bare titles) don't match
+NOTIFICATION_RE = re.compile(r"^(\S+) ([^\r\n]*)", re.MULTILINE)
 
 
 class NotificationProcessor:
@@ -9,38 +14,11 @@ class NotificationProcessor:
     def __init__(self, logger: logging.Logger):
         self.logger = logger
         self.msg_dict: dict = {}
-
-    async def process_notifications(self, msg: str) -> dict:
-        """Parse a message and store the attributes and values in a dictionary"""
-        self.logger.debug("Processing notifications: %s", msg)
-        notifications = msg.strip().split("\r\n")
-
-        for notification in notifications:
-            # ignore ok
-            if not notification or notification == "OK":
-                continue
-
-            parts = notification.split(" ", 1)
-            # ignore empty notifications
-            if len(parts) < 2:
-                continue
-
-            title, signal_info = parts
-            self.logger.debug("Processing notification Title: %s", title)
-
-            if title == "PowerOff":
-                self.msg_dict["is_on"] = False
-            elif title == "NoSignal":
-                self.msg_dict["is_signal"] = False
-            elif title == "Standby":
-                self.msg_dict["is_on"] = False
-            else:
-                self._process_signal_info(title, signal_info.split())
-
-        return self.msg_dict
-
-    def _process_signal_info(self, title: str, signal_info: list[str]) -> None:
-        processors = {
+        # built once so each notification is a single dict lookup on its title
+        self.processors: dict[str, Callable[[list[str]], None]] = {
+            "PowerOff": self._process_power_off,
+            "Standby": self._process_power_off,
+            "NoSignal": self._process_no_signal,
             "IncomingSignalInfo": self._process_incoming_signal,
             "OutgoingSignalInfo": self._process_outgoing_signal,
             "AspectRatio": self._process_aspect_ratio,
@@ -50,14 +28,36 @@ class NotificationProcessor:
             "MacAddress": self._process_mac_address,
             "Temperatures": self._process_temperatures,
         }
-        processor = processors.get(title)
+
+    async def process_notifications(self, msg: str) -> dict:
+        """Parse a message and store the attributes and values in a dictionary"""
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self.logger.debug("Processing notifications: %s", msg)
+        # tokenize the whole buffer in one pass instead of splitting and checking each line
+        for title, signal_info in NOTIFICATION_RE.findall(msg):
+            if debug:
+                self.logger.debug("Processing notification Title: %s", title)
+
+            self._process_signal_info(title, signal_info.split())
+
+        return self.msg_dict
+
+    def _process_signal_info(self, title: str, signal_info: list[str]) -> None:
+        processor = self.processors.get(title)
         if processor:
             try:
                 # Call the processor function
                 processor(signal_info)
             except (KeyError, IndexError) as e:
-                self.logger.error(f"Error processing {title}: {e}")
-                self.logger.debug(f"Signal info: {signal_info}")
+                self.logger.error("Error processing %s: %s", title, e)
+                self.logger.debug("Signal info: %s", signal_info)
+
+    def _process_power_off(self, _info: list[str]) -> None:
+        self.msg_dict["is_on"] = False
+
+    def _process_no_signal(self, _info: list[str]) -> None:
+        self.msg_dict["is_signal"] = False
 
     def _process_mac_address(self, info: list[str]) -> None:
         self.msg_dict["mac_address"] = info[0]
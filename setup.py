@@ -12,7 +12,7 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/iloveicedgreentea/py-madvr",
     packages=setuptools.find_packages(exclude=["tests","tests.*"]),
-    package_data={"py_madvr2": ["py.typed"]},
+    package_data={"madvr": ["py.typed"]},
     classifiers=[
         "Programming Language :: Python :: 3.12",
         "License :: OSI Approved :: MIT License",
@@ -17,20 +17,22 @@ def mock_madvr():
         madvr.writer = AsyncMock()
         madvr.reader = AsyncMock()
         madvr._set_connected = AsyncMock()
-        madvr._clear_attr = AsyncMock()
+        madvr._clear_attr = MagicMock()
         madvr.is_device_connectable = AsyncMock()
         madvr.close_connection = AsyncMock()
-        madvr._construct_command = AsyncMock()
+        madvr._construct_command = MagicMock()
         madvr._write_with_timeout = AsyncMock()
         madvr.stop = MagicMock()
         madvr.stop_commands_flag = MagicMock()
         madvr.stop_heartbeat = MagicMock()
         madvr.add_command_to_queue = AsyncMock()
+        madvr._send_command_batch = AsyncMock()
         madvr._reconnect = AsyncMock()
         madvr._write_with_timeout = AsyncMock()
 
         # Mock the background tasks to prevent warnings
         madvr.task_handle_queue = AsyncMock()
+        madvr.task_write_frames = AsyncMock()
         madvr.task_read_notifications = AsyncMock()
         # madvr.send_heartbeat = AsyncMock()
         madvr.task_ping_until_alive = AsyncMock()
@@ -1,10 +1,15 @@
 # type: ignore
 import asyncio
-from unittest.mock import AsyncMock, MagicMock, patch
+import errno
+import socket
+import time
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
 
 import pytest
 
+from madvr.consts import CONNECT_PROBE_RETRIES, USER_TIMEOUT
 from madvr.errors import HeartBeatError
+from madvr.madvr import Madvr
 
 
 @pytest.mark.asyncio
@@ -14,22 +19,47 @@ async def test_init(mock_madvr):
     assert isinstance(mock_madvr.command_queue, asyncio.Queue)
 
 
+@pytest.mark.asyncio
+async def test_read_limit_alias(mock_madvr):
+    with pytest.warns(DeprecationWarning):
+        assert mock_madvr.read_limit == mock_madvr.stream_limit
+    with pytest.warns(DeprecationWarning):
+        mock_madvr.read_limit = 2**20
+    assert mock_madvr.stream_limit == 2**20
+
+
 @pytest.mark.asyncio
 async def test_is_on_property(mock_madvr):
-    mock_madvr.msg_dict = {"is_on": True}
+    await Madvr._set_connected(mock_madvr, True)
     assert mock_madvr.is_on is True
+    assert mock_madvr.msg_dict["is_on"] is True
 
-    mock_madvr.msg_dict = {"is_on": False}
+    await Madvr._set_connected(mock_madvr, False)
     assert mock_madvr.is_on is False
+    assert mock_madvr.msg_dict["is_on"] is False
 
 
 @pytest.mark.asyncio
-async def test_mac_address_property(mock_madvr):
-    mock_madvr.msg_dict = {"mac_address": "00:11:22:33:44:55"}
-    assert mock_madvr.mac_address == "00:11:22:33:44:55"
+async def test_is_on_follows_power_off_notification(mock_madvr):
+    await Madvr._set_connected(mock_madvr, True)
+    mock_madvr._update_ha_state = AsyncMock()
+
+    await mock_madvr._process_notifications("PowerOff 0\r\n")
 
-    mock_madvr.msg_dict = {}
+    assert mock_madvr.is_on is False
+
+
+@pytest.mark.asyncio
+async def test_mac_address_property(mock_madvr):
     assert mock_madvr.mac_address == ""
+    mock_madvr._update_ha_state = AsyncMock()
+
+    await mock_madvr._process_notifications("MacAddress 00-11-22-33-44-55\r\n")
+    assert mock_madvr.mac_address == "00-11-22-33-44-55"
+
+    # still known after power off so WOL can use it
+    Madvr._clear_attr(mock_madvr)
+    assert mock_madvr.mac_address == "00-11-22-33-44-55"
 
 
 @pytest.mark.asyncio
@@ -41,10 +71,12 @@ async def test_set_update_callback(mock_madvr):
 
 @pytest.mark.asyncio
 async def test_async_add_tasks(mock_madvr):
-    with patch("asyncio.get_event_loop") as mock_loop:
-        mock_loop.return_value.create_task = AsyncMock()
+    with patch("asyncio.get_running_loop") as mock_loop:
+        mock_loop.return_value.create_task = MagicMock()
         await mock_madvr.async_add_tasks()
-        assert len(mock_madvr.tasks) == 5  # Assuming 5 tasks are created
+        assert len(mock_madvr.tasks) == 6  # Assuming 6 tasks are created
+        create_task = mock_loop.return_value.create_task
+        assert create_task.return_value.add_done_callback.call_count == 6
 
 
 @pytest.mark.asyncio
@@ -65,7 +97,9 @@ async def test_open_connection(mock_madvr):
     await mock_madvr.open_connection()
 
     mock_madvr._reconnect.assert_called_once()
-    assert mock_madvr.add_command_to_queue.call_count == 5
+    mock_madvr._send_command_batch.assert_called_once()
+    assert len(mock_madvr._send_command_batch.call_args.args[0]) == 5
+    mock_madvr.add_command_to_queue.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -75,12 +109,22 @@ async def test_open_connection_error(mock_madvr):
     with pytest.raises(ConnectionError):
         await mock_madvr.open_connection()
 
-    mock_madvr.add_command_to_queue.assert_not_called()
+    mock_madvr._send_command_batch.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_open_connection_offline_skips_refresh(mock_madvr):
+    # _reconnect leaves the device marked off without raising when the probe fails
+    with patch("madvr.madvr.Madvr.connected", new_callable=PropertyMock, return_value=False):
+        await mock_madvr.open_connection()
+
+    mock_madvr._reconnect.assert_called_once()
+    mock_madvr._send_command_batch.assert_not_called()
 
 
 @pytest.mark.asyncio
 async def test_power_on(mock_madvr, mock_send_magic_packet):
-    mock_madvr.msg_dict = {"mac_address": "00:11:22:33:44:55"}
+    mock_madvr._mac_address = "00:11:22:33:44:55"
     mock_madvr.stop_commands_flag = MagicMock()
     mock_madvr.stop_commands_flag.is_set.return_value = False
 
@@ -115,4 +159,619 @@ async def test_power_off_standby(mock_madvr):
     mock_madvr.close_connection.assert_called_once()
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "command, expected",
+    [
+        (["PowerOff"], b"PowerOff\r\n"),
+        (["KeyPress, MENU"], b"KeyPress MENU\r\n"),
+        (["KeyHold", "UP"], b"KeyHold UP\r\n"),
+        (["ActivateProfile, SOURCE, 1"], b"ActivateProfile SOURCE 1\r\n"),
+    ],
+)
+async def test_construct_command(mock_madvr, command, expected):
+    cmd, _ = Madvr._construct_command(mock_madvr, command)
+    assert cmd == expected
+
+
+@pytest.mark.asyncio
+async def test_construct_command_not_implemented(mock_madvr):
+    with pytest.raises(NotImplementedError):
+        Madvr._construct_command(mock_madvr, ["NotACommand"])
+    with pytest.raises(NotImplementedError):
+        Madvr._construct_command(mock_madvr, ["KeyPress, NOTAKEY"])
+
+
+@pytest.mark.asyncio
+async def test_construct_command_cached(mock_madvr):
+    mock_madvr._cmd_cache = {}
+    first = Madvr._construct_command(mock_madvr, ["KeyPress, MENU"])
+    assert mock_madvr._cmd_cache[("KeyPress, MENU",)] == first
+    assert Madvr._construct_command(mock_madvr, ["KeyPress, MENU"]) == first
+    assert len(mock_madvr._cmd_cache) == 1
+
+    with pytest.raises(NotImplementedError):
+        Madvr._construct_command(mock_madvr, ["KeyPress, NOTAKEY"])
+    assert ("KeyPress, NOTAKEY",) not in mock_madvr._cmd_cache
+
+
+@pytest.mark.asyncio
+async def test_task_handle_queue_sends_queued_command(mock_madvr):
+    mock_madvr.stop_commands_flag = asyncio.Event()
+    mock_madvr.connection_event.set()
+    task = asyncio.create_task(Madvr.task_handle_queue(mock_madvr))
+
+    await mock_madvr.command_queue.put(b"PowerOff\r\n")
+    await asyncio.wait_for(mock_madvr.command_queue.join(), timeout=1)
+
+    mock_madvr._write_with_timeout.assert_called_once_with(b"PowerOff\r\n")
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_send_command_batch_single_write(mock_madvr):
+    mock_madvr._construct_command = MagicMock(
+        side_effect=[(b"GetAspectRatio\r\n", None), (b"GetMaskingRatio\r\n", None)]
+    )
+    mock_madvr.stop_commands_flag = asyncio.Event()
+
+    await Madvr._send_command_batch(mock_madvr, [["GetAspectRatio"], ["GetMaskingRatio"]])
+
+    mock_madvr._write_with_timeout.assert_called_once_with(b"GetAspectRatio\r\nGetMaskingRatio\r\n")
+
+
+@pytest.mark.asyncio
+async def test_send_command_batch_skipped_when_stopped(mock_madvr):
+    mock_madvr.stop_commands_flag = asyncio.Event()
+    mock_madvr.stop_commands_flag.set()
+
+    await Madvr._send_command_batch(mock_madvr, [["GetAspectRatio"]])
+
+    mock_madvr._write_with_timeout.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_is_device_connectable():
+    server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        assert await Madvr("127.0.0.1", port=port).is_device_connectable() is True
+    with patch("madvr.madvr.SMALL_DELAY", 0.01):
+        assert await Madvr("127.0.0.1", port=port).is_device_connectable() is False
+
+
+@pytest.mark.asyncio
+async def test_clear_queue_keeps_queue(mock_madvr):
+    queue = mock_madvr.command_queue
+    await queue.put(["PowerOff"])
+    await queue.put(["Standby"])
+
+    mock_madvr.clear_queue()
+
+    assert mock_madvr.command_queue is queue
+    assert queue.empty()
+    await asyncio.wait_for(queue.join(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_update_ha_state_coalesced(mock_madvr):
+    callback = MagicMock()
+    mock_madvr.set_update_callback(callback)
+
+    await mock_madvr._update_ha_state()
+    await mock_madvr._update_ha_state()
+    await asyncio.sleep(0.1)
+
+    callback.assert_called_once_with(mock_madvr.msg_dict)
+
+
+@pytest.mark.asyncio
+async def test_task_read_notifications_reads_framed_lines(mock_madvr):
+    mock_madvr.reader = asyncio.StreamReader()
+    mock_madvr.reader.feed_data(b"AspectRatio 3840:1600 2.400 240 Panavision\r\nOK\r\nMaskingRa")
+    mock_madvr._process_notifications = AsyncMock()
+    mock_madvr.connection_event.set()
+    task = asyncio.create_task(Madvr.task_read_notifications(mock_madvr))
+
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert [c.args[0] for c in mock_madvr._process_notifications.call_args_list] == [
+        "AspectRatio 3840:1600 2.400 240 Panavision\r\n",
+        "OK\r\n",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_task_read_notifications_reconnects_on_eof(mock_madvr):
+    mock_madvr.reader = asyncio.StreamReader()
+    mock_madvr._process_notifications = AsyncMock()
+    mock_madvr.connection_event.set()
+    task = asyncio.create_task(Madvr.task_read_notifications(mock_madvr))
+
+    await asyncio.sleep(0.05)
+    # an idle connection just waits, it is not treated as a failure
+    mock_madvr._reconnect.assert_not_called()
+    mock_madvr._reconnect.side_effect = lambda: mock_madvr.connection_event.clear()
+    mock_madvr.reader.feed_eof()
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    mock_madvr._reconnect.assert_called_once()
+    mock_madvr._process_notifications.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_task_read_notifications_ignores_closed_connection(mock_madvr):
+    reader = asyncio.StreamReader()
+    mock_madvr.reader = reader
+    mock_madvr._process_notifications = AsyncMock()
+    mock_madvr.connection_event.set()
+    task = asyncio.create_task(Madvr.task_read_notifications(mock_madvr))
+    await asyncio.sleep(0.05)
+
+    # close_connection drops the stream while readuntil is pending, as on power off or a socket error
+    mock_madvr.reader = None
+    mock_madvr.connection_event.clear()
+    reader.feed_eof()
+    await asyncio.sleep(0.05)
+    assert not task.done()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    mock_madvr._reconnect.assert_not_called()
+    mock_madvr._process_notifications.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_task_read_notifications_discards_oversized_line(mock_madvr):
+    mock_madvr.reader = asyncio.StreamReader(limit=16)
+    mock_madvr.reader.feed_data(b"AspectRatio 3840:1600 2.400 240 Panavision\r\nOK\r\n")
+    mock_madvr._process_notifications = AsyncMock()
+    mock_madvr.connection_event.set()
+    task = asyncio.create_task(Madvr.task_read_notifications(mock_madvr))
+
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    # no fragment of the long line is processed, reading picks up at the next notification
+    assert [c.args[0] for c in mock_madvr._process_notifications.call_args_list] == ["OK\r\n"]
+
+
+@pytest.mark.asyncio
+async def test_task_read_notifications_reconnects_on_reset_while_discarding(mock_madvr):
+    mock_madvr.reader = asyncio.StreamReader(limit=8)
+    mock_madvr.reader.feed_data(b"AspectRatio 3840:1600 2.400 240 Panavision\r\n")
+    mock_madvr.reader.read = AsyncMock(side_effect=ConnectionResetError)
+    mock_madvr._process_notifications = AsyncMock()
+    mock_madvr._reconnect.side_effect = lambda: mock_madvr.connection_event.clear()
+    mock_madvr.connection_event.set()
+    task = asyncio.create_task(Madvr.task_read_notifications(mock_madvr))
+
+    await asyncio.sleep(0.05)
+    # the reset goes through the usual reconnect instead of ending the task
+    assert not task.done()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    mock_madvr._reconnect.assert_called_once()
+    mock_madvr._process_notifications.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_task_write_frames_writes_in_order(mock_madvr):
+    mock_madvr.writer = MagicMock()
+    mock_madvr.writer.drain = AsyncMock()
+    loop = asyncio.get_running_loop()
+    heartbeat, power_off = loop.create_future(), loop.create_future()
+    await mock_madvr.write_queue.put((mock_madvr.writer, b"Heartbeat\r\n", heartbeat))
+    await mock_madvr.write_queue.put((mock_madvr.writer, b"PowerOff\r\n", power_off))
+    task = asyncio.create_task(Madvr.task_write_frames(mock_madvr))
+
+    await asyncio.wait_for(mock_madvr.write_queue.join(), timeout=1)
+    # both frames were already queued, so they go out in one write and drain
+    mock_madvr.writer.writelines.assert_called_once()
+
+    written = [frame for c in mock_madvr.writer.writelines.call_args_list for frame in c.args[0]]
+    assert written == [b"Heartbeat\r\n", b"PowerOff\r\n"]
+    assert heartbeat.result() is None
+    assert power_off.result() is None
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_task_write_frames_drops_frames_for_old_connection(mock_madvr):
+    old_writer = MagicMock()
+    mock_madvr.writer = MagicMock()
+    mock_madvr.writer.drain = AsyncMock()
+    stale = asyncio.get_running_loop().create_future()
+    await mock_madvr.write_queue.put((old_writer, b"KeyPress MENU\r\n", stale))
+    task = asyncio.create_task(Madvr.task_write_frames(mock_madvr))
+
+    await asyncio.wait_for(mock_madvr.write_queue.join(), timeout=1)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    with pytest.raises(ConnectionError):
+        stale.result()
+    old_writer.writelines.assert_not_called()
+    mock_madvr.writer.writelines.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_write_with_timeout_surfaces_write_errors(mock_madvr):
+    mock_madvr.writer = MagicMock()
+    mock_madvr.writer.drain = AsyncMock(side_effect=ConnectionResetError)
+    mock_madvr._write_with_timeout = Madvr._write_with_timeout.__get__(mock_madvr)
+    task = mock_madvr._write_task = asyncio.create_task(Madvr.task_write_frames(mock_madvr))
+
+    with pytest.raises(ConnectionResetError):
+        await mock_madvr._write_with_timeout(b"Heartbeat\r\n")
+    # closing lets the reader notice and reconnect
+    mock_madvr.writer.close.assert_called_once()
+
+    with pytest.raises(HeartBeatError):
+        await mock_madvr.send_heartbeat(once=True)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_process_notifications_only_updates_on_change(mock_madvr):
+    mock_madvr._update_ha_state = AsyncMock()
+    msg = "Temperatures 50 60 70 80\r\n"
+
+    await mock_madvr._process_notifications(msg)
+    await mock_madvr._process_notifications(msg)
+
+    assert mock_madvr.msg_dict["temp_gpu"] == "50"
+    mock_madvr._update_ha_state.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_is_on_after_power_cycle(mock_madvr):
+    mock_madvr._update_ha_state = AsyncMock()
+    await mock_madvr.notification_processor.process_notifications("PowerOff 0\r\n")
+    Madvr._clear_attr(mock_madvr)
+
+    await Madvr._set_connected(mock_madvr, True)
+    await mock_madvr._process_notifications("Temperatures 50 60 70 80\r\n")
+
+    assert mock_madvr.is_on is True
+
+
+@pytest.mark.asyncio
+async def test_task_handle_queue_survives_stop(mock_madvr):
+    mock_madvr.stop_commands_flag = asyncio.Event()
+    mock_madvr.connection_event.set()
+    task = asyncio.create_task(Madvr.task_handle_queue(mock_madvr))
+    await mock_madvr.command_queue.put(b"KeyPress MENU\r\n")
+
+    Madvr.stop(mock_madvr)
+    await asyncio.wait_for(mock_madvr.command_queue.join(), timeout=1)
+    mock_madvr._write_with_timeout.assert_not_called()
+
+    # reconnecting clears the flag and the same task picks up new commands
+    mock_madvr.stop_commands_flag.clear()
+    await mock_madvr.command_queue.put(b"PowerOff\r\n")
+    await asyncio.wait_for(mock_madvr.command_queue.join(), timeout=1)
+    mock_madvr._write_with_timeout.assert_called_once_with(b"PowerOff\r\n")
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_task_ping_skips_probe_when_recently_read(mock_madvr):
+    mock_madvr._last_read = time.monotonic()
+    with patch("madvr.madvr.asyncio.sleep", AsyncMock(side_effect=[None, asyncio.CancelledError])):
+        with pytest.raises(asyncio.CancelledError):
+            await Madvr.task_ping_until_alive(mock_madvr)
+    mock_madvr.is_device_connectable.assert_not_called()
+
+    # nothing heard from the device for too long, probe again
+    mock_madvr._last_read = 0.0
+    mock_madvr.writer = MagicMock()
+    mock_madvr.writer.get_extra_info.return_value.getsockopt.return_value = 0
+    with patch("madvr.madvr.asyncio.sleep", AsyncMock(side_effect=asyncio.CancelledError)):
+        with pytest.raises(asyncio.CancelledError):
+            await Madvr.task_ping_until_alive(mock_madvr)
+    mock_madvr.is_device_connectable.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_send_heartbeat_stops_immediately(mock_madvr):
+    mock_madvr.stop_heartbeat = asyncio.Event()
+    mock_madvr.heartbeat_interval = 60
+    mock_madvr.connection_event.set()
+    task = asyncio.create_task(mock_madvr.send_heartbeat())
+    await asyncio.sleep(0)
+
+    mock_madvr.stop_heartbeat.set()
+    await asyncio.sleep(0.05)
+    # paused, not ended, so a later reconnect can resume it
+    assert not task.done()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    mock_madvr._write_with_timeout.assert_called_once_with(mock_madvr.HEARTBEAT)
+
+
+@pytest.mark.asyncio
+async def test_send_heartbeat_resumes_after_reconnect(mock_madvr):
+    mock_madvr.stop_heartbeat = asyncio.Event()
+    mock_madvr.heartbeat_interval = 0.05
+    mock_madvr.connection_event.set()
+    task = asyncio.create_task(mock_madvr.send_heartbeat())
+    await asyncio.sleep(0)
+
+    # stop and drop the connection as power_off does
+    mock_madvr.stop_heartbeat.set()
+    mock_madvr.connection_event.clear()
+    await asyncio.sleep(0.1)
+    sent = mock_madvr._write_with_timeout.call_count
+
+    # _reconnect marks the connection up and clears the stop flag
+    mock_madvr.connection_event.set()
+    mock_madvr.stop_heartbeat.clear()
+    await asyncio.sleep(0.2)
+    assert not task.done()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert mock_madvr._write_with_timeout.call_count > sent
+
+
+@pytest.mark.asyncio
+async def test_task_ping_socket_error_reconnects(mock_madvr):
+    state = {"connected": True}
+    mock_madvr._handle_power_off = AsyncMock()
+    mock_madvr.close_connection = AsyncMock(side_effect=lambda: state.update(connected=False))
+    mock_madvr.open_connection = AsyncMock()
+    mock_madvr.is_device_connectable = AsyncMock(return_value=True)
+    mock_madvr.writer = MagicMock()
+    mock_madvr.writer.get_extra_info.return_value.getsockopt.return_value = errno.ECONNRESET
+    with patch(
+        "madvr.madvr.Madvr.connected", new_callable=PropertyMock, side_effect=lambda: state["connected"]
+    ), patch("madvr.madvr.asyncio.sleep", AsyncMock(side_effect=asyncio.CancelledError)):
+        with pytest.raises(asyncio.CancelledError):
+            await Madvr.task_ping_until_alive(mock_madvr)
+
+    # a reset on a reachable device is not a power off
+    mock_madvr.close_connection.assert_called_once()
+    mock_madvr._handle_power_off.assert_not_called()
+    assert mock_madvr.powered_off_recently is False
+    mock_madvr.is_device_connectable.assert_called_once_with(retries=1)
+    mock_madvr.open_connection.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_configure_socket():
+    server = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    madvr = Madvr("127.0.0.1", port=port)
+    async with server:
+        _, madvr.writer = await asyncio.open_connection("127.0.0.1", port)
+        madvr._configure_socket()
+        sock = madvr.writer.get_extra_info("socket")
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+        assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        if hasattr(socket, "TCP_USER_TIMEOUT"):
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT) == USER_TIMEOUT * 1000
+        assert madvr.writer.transport.get_write_buffer_limits() == (0, 0)
+        madvr.writer.close()
+        await madvr.writer.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_close_connection_marks_off_before_wait_closed(mock_madvr):
+    writer = MagicMock()
+    closed = asyncio.Event()
+    writer.wait_closed = closed.wait
+    mock_madvr.writer = writer
+    mock_madvr.update_callback = MagicMock()
+    mock_madvr._clear_attr = Madvr._clear_attr.__get__(mock_madvr)
+    task = asyncio.create_task(Madvr.close_connection(mock_madvr))
+    await asyncio.sleep(0.05)
+
+    # HA is told the device is off while the socket is still closing
+    writer.close.assert_called_once()
+    assert not task.done()
+    mock_madvr._set_connected.assert_called_once_with(False)
+    mock_madvr.update_callback.assert_called_once_with({"is_on": False})
+    assert mock_madvr.writer is None
+
+    closed.set()
+    await asyncio.wait_for(task, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_task_ping_backs_off_while_unreachable(mock_madvr):
+    # a port nothing listens on, the real probe is refused straight away
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        mock_madvr.port = sock.getsockname()[1]
+    mock_madvr.host = "127.0.0.1"
+    mock_madvr.ping_interval = 5
+    mock_madvr.is_device_connectable = Madvr.is_device_connectable.__get__(mock_madvr)
+    sleep = AsyncMock(side_effect=[None] * 4 + [asyncio.CancelledError])
+    with patch("madvr.madvr.Madvr.connected", new_callable=PropertyMock, return_value=False), patch(
+        "madvr.madvr.asyncio.sleep", sleep
+    ), patch("madvr.madvr.random.uniform", return_value=0.25):
+        with pytest.raises(asyncio.CancelledError):
+            await Madvr.task_ping_until_alive(mock_madvr)
+
+    # only the task's backoff sleeps, the probe itself does not retry
+    assert [c.args[0] for c in sleep.call_args_list] == [1.25, 2.25, 4.25, 5.25, 5.25]
+
+
+@pytest.mark.asyncio
+async def test_task_ping_resets_backoff_after_success(mock_madvr):
+    mock_madvr.ping_interval = 5
+    mock_madvr.is_device_connectable = AsyncMock(side_effect=[False, False, True, False])
+    mock_madvr.open_connection = AsyncMock()
+    sleep = AsyncMock(side_effect=[None] * 3 + [asyncio.CancelledError])
+    with patch("madvr.madvr.Madvr.connected", new_callable=PropertyMock, return_value=False), patch(
+        "madvr.madvr.asyncio.sleep", sleep
+    ), patch("madvr.madvr.random.uniform", return_value=0.25):
+        with pytest.raises(asyncio.CancelledError):
+            await Madvr.task_ping_until_alive(mock_madvr)
+
+    assert [c.args[0] for c in sleep.call_args_list] == [1.25, 2.25, 5, 1.25]
+    mock_madvr.is_device_connectable.assert_called_with(retries=1)
+    mock_madvr.open_connection.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_task_ping_retries_probe_while_connected(mock_madvr):
+    mock_madvr._last_read = 0.0
+    mock_madvr._socket_alive = MagicMock(return_value=True)
+    mock_madvr._handle_power_off = AsyncMock()
+    mock_madvr.is_device_connectable = AsyncMock(return_value=False)
+    with patch("madvr.madvr.asyncio.sleep", AsyncMock(side_effect=asyncio.CancelledError)):
+        with pytest.raises(asyncio.CancelledError):
+            await Madvr.task_ping_until_alive(mock_madvr)
+
+    # one dropped probe is not enough to declare a connected device off
+    mock_madvr.is_device_connectable.assert_called_once_with(retries=CONNECT_PROBE_RETRIES)
+    mock_madvr._handle_power_off.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_add_command_to_queue_validates(mock_madvr):
+    mock_madvr._construct_command = Madvr._construct_command.__get__(mock_madvr)
+
+    await Madvr.add_command_to_queue(mock_madvr, ["KeyPress, MENU"])
+    assert mock_madvr.command_queue.get_nowait() == b"KeyPress MENU\r\n"
+    # any iterable works, not only lists
+    await Madvr.add_command_to_queue(mock_madvr, iter(["KeyHold", "UP"]))
+    assert mock_madvr.command_queue.get_nowait() == b"KeyHold UP\r\n"
+
+    with pytest.raises(NotImplementedError):
+        await Madvr.add_command_to_queue(mock_madvr, ["KeyPress, NOTAKEY"])
+    assert mock_madvr.command_queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_async_cancel_tasks(mock_madvr):
+    task = asyncio.create_task(asyncio.sleep(60))
+    mock_madvr.tasks = [task]
+    mock_madvr.update_callback = MagicMock()
+    await mock_madvr._update_ha_state()
+
+    await mock_madvr.async_cancel_tasks()
+    await asyncio.sleep(0.1)
+
+    assert task.cancelled()
+    assert mock_madvr.tasks == []
+    mock_madvr.update_callback.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_writes_fail_fast_after_cancel_tasks():
+    madvr = Madvr("127.0.0.1")
+    await madvr.async_add_tasks()
+    madvr.writer = MagicMock()
+    madvr.writer.wait_closed = AsyncMock()
+    madvr.connection_event.set()
+    await madvr.async_cancel_tasks()
+
+    # no writer task left, so neither call waits on a queue nobody drains
+    with patch.object(madvr.logger, "warning") as warning:
+        await asyncio.wait_for(madvr.close_connection(), timeout=0.5)
+    warning.assert_not_called()
+    madvr.connection_event.set()
+    madvr.writer = MagicMock()
+    with pytest.raises(ConnectionError):
+        await asyncio.wait_for(madvr.send_command(["KeyPress", "MENU"]), timeout=0.5)
+
+
+@pytest.mark.asyncio
+async def test_wait_for_welcome(mock_madvr):
+    mock_madvr.reader = asyncio.StreamReader()
+    mock_madvr.reader.feed_data(b"WELCOME to Envy v1.0.0.0\r\nOK\r\n")
+
+    await asyncio.wait_for(Madvr._wait_for_welcome(mock_madvr), timeout=0.5)
+    # only the banner is consumed, the rest is left for the notification reader
+    assert await mock_madvr.reader.readuntil(b"\r\n") == b"OK\r\n"
+
+    with patch("madvr.madvr.SMALL_DELAY", 0.01):
+        await Madvr._wait_for_welcome(mock_madvr)
+
+    mock_madvr.reader.feed_eof()
+    with pytest.raises(asyncio.IncompleteReadError):
+        await Madvr._wait_for_welcome(mock_madvr)
+
+
+@pytest.mark.asyncio
+async def test_power_off_reaches_device():
+    received = asyncio.Queue()
+
+    async def handle(reader, writer):
+        writer.write(b"WELCOME to Envy\r\n")
+        data = b""
+        try:
+            while chunk := await reader.read(1024):
+                data += chunk
+        except ConnectionResetError:
+            pass
+        finally:
+            writer.close()
+        # connectivity probes close without sending anything
+        if data:
+            received.put_nowait(data)
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    madvr = Madvr("127.0.0.1", port=port)
+    writer_task = madvr._write_task = asyncio.create_task(madvr.task_write_frames())
+    try:
+        await madvr.open_connection()
+        await madvr.power_off()
+        data = await asyncio.wait_for(received.get(), timeout=2)
+    finally:
+        writer_task.cancel()
+        await asyncio.gather(writer_task, return_exceptions=True)
+        server.close()
+
+    assert data.endswith(b"PowerOff\r\n")
+    assert madvr.writer is None
+
+
+@pytest.mark.asyncio
+async def test_power_off_does_not_reconnect_reader():
+    async def handle(reader, writer):
+        writer.write(b"WELCOME to Envy\r\n")
+        try:
+            while await reader.read(1024):
+                pass
+        except ConnectionResetError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    madvr = Madvr("127.0.0.1", port=port)
+    madvr._write_task = asyncio.create_task(madvr.task_write_frames())
+    tasks = [madvr._write_task, asyncio.create_task(madvr.task_read_notifications())]
+    try:
+        await madvr.open_connection()
+        assert madvr.connected
+        await madvr.power_off()
+        # the closed stream wakes the pending read, that must not open a new connection
+        await asyncio.sleep(0.2)
+        assert not madvr.connected
+        assert not madvr.is_on
+        assert madvr.writer is None
+        assert all(not task.done() for task in tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        server.close()
+
+
 # Add more tests as needed for other methods and edge cases
@@ -0,0 +1,47 @@
+# type: ignore
+import logging
+
+import pytest
+
+from madvr.notifications import NotificationProcessor
+
+
+@pytest.fixture
+def processor():
+    return NotificationProcessor(logging.getLogger(__name__))
+
+
+@pytest.mark.asyncio
+async def test_process_incoming_signal(processor):
+    msg = "IncomingSignalInfo 3840x2160 23.976p 2D 422 10bit HDR10 2020 TV 16:9\r\n"
+    data = await processor.process_notifications(msg)
+
+    assert data["is_signal"] is True
+    assert data["incoming_res"] == "3840x2160"
+    assert data["hdr_flag"] is True
+    assert data["incoming_aspect_ratio"] == "16:9"
+
+
+@pytest.mark.asyncio
+async def test_process_multiple_notifications(processor):
+    msg = "OK\r\nAspectRatio 3840:1600 2.400 240 Panavision\r\nMaskingRatio 3840:1600 2.400 240\r\n"
+    data = await processor.process_notifications(msg)
+
+    assert data["aspect_dec"] == 2.4
+    assert data["aspect_name"] == "Panavision"
+    assert data["masking_int"] == "240"
+
+
+@pytest.mark.asyncio
+async def test_process_power_off_and_no_signal(processor):
+    data = await processor.process_notifications("NoSignal 0\r\nPowerOff 0\r\n")
+
+    assert data["is_signal"] is False
+    assert data["is_on"] is False
+
+
+@pytest.mark.asyncio
+async def test_process_malformed_notification(processor):
+    data = await processor.process_notifications("Temperatures 50 60\r\nUnknownTitle foo\r\n")
+
+    assert "temp_gpu" not in data